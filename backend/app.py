@@ -6,14 +6,44 @@ Flask API server for live LaTeX compilation during presentations
 
 import os
 import sys
+import stat
 import tempfile
 import subprocess
 from pathlib import Path
-from flask import Flask, request, jsonify, send_file, render_template, send_from_directory
+from flask import Flask, Response, request, jsonify, send_file, render_template, send_from_directory
 from flask_cors import CORS
-import base64
-import uuid
+
+# Shared workshop settings live in config.py at the project root
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import DEFAULT_DPI, MIN_DPI, MAX_DPI, CACHE_MAX_MB
+
+try:
+    from PIL import Image, ImageChops
+except ImportError:
+    Image = None
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # fall back to the pdftoppm/ImageMagick subprocess path
+    pdfium = None
+import re
+import threading
 import shutil
+import hashlib
+import uuid
+import functools
+import contextlib
+import json
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+import queue
+import time
 
 # Set up Flask app with proper template and static directories
 app = Flask(__name__, 
@@ -21,12 +51,42 @@ app = Flask(__name__,
            static_folder='../static')
 CORS(app)  # Enable CORS for frontend communication
 
+def _private_tmpfs_dir():
+    """
+    Per-user scratch directory in /dev/shm. Anyone can create entries there, so if the
+    name is taken by something other than our own directory, use a fresh private one
+    """
+    path = Path(f"/dev/shm/latex-slides-{os.getuid()}")
+    try:
+        path.mkdir(mode=0o700, exist_ok=True)
+        info = os.lstat(path)  # lstat, so a planted symlink is rejected
+        if stat.S_ISDIR(info.st_mode) and info.st_uid == os.getuid():
+            os.chmod(path, 0o700)
+            return path
+    except OSError:
+        pass
+    return Path(tempfile.mkdtemp(prefix="latex-slides-", dir="/dev/shm"))
+
 # Configuration
-TEMP_DIR = Path(__file__).parent.parent / "temp"
-TEMP_DIR.mkdir(exist_ok=True)
+# Scratch files live for well under a second, so keep them in RAM (tmpfs) on Linux
+if "LATEX_TMPFS" in os.environ:
+    TEMP_DIR = Path(os.environ["LATEX_TMPFS"])
+elif sys.platform.startswith("linux") and Path("/dev/shm").is_dir():
+    TEMP_DIR = _private_tmpfs_dir()
+else:
+    TEMP_DIR = Path(__file__).parent.parent / "temp"
+TEMP_DIR.mkdir(parents=True, exist_ok=True)
+# Rendered PNGs, by content hash; pruned to CACHE_MAX_MB (least recently used first)
+CACHE_DIR = TEMP_DIR / "cache"
+CACHE_DIR.mkdir(exist_ok=True)
+CACHE_PRUNE_INTERVAL = 10  # seconds between size checks in each process
+
+# External tools, resolved once instead of forking `which` on every compile
+TOOL_PATHS = {name: shutil.which(name) for name in
+              ("pdflatex", "biber", "bibtex", "pdftoppm", "convert", "magick", "pdfcrop")}
 
 # Base LaTeX preamble (from your notebook)
-BASE_PREAMBLE = r"""
+BASE_PREAMBLE_FULL = r"""
 \documentclass[11pt]{article}
 \usepackage[margin=0.5in]{geometry}
 \usepackage{amsmath,amsfonts,amssymb}
@@ -38,87 +98,274 @@ BASE_PREAMBLE = r"""
 \usepackage{microtype}
 """
 
+# Interactive previews skip hyperref (links do nothing in a PNG) and microtype (invisible
+# at preview resolution), the two slowest packages to load. hyperref's link commands are
+# stubbed to print their text
+BASE_PREAMBLE_FAST = r"""
+\documentclass[11pt]{article}
+\usepackage[margin=0.5in]{geometry}
+\usepackage{amsmath,amsfonts,amssymb}
+\usepackage{siunitx}
+\usepackage{booktabs}
+\usepackage{graphicx}
+\usepackage{float}
+\usepackage{url}
+\providecommand{\href}[2]{#2}
+\providecommand{\hyperref}[2][]{#2}
+\providecommand{\hyperlink}[2]{#2}
+\providecommand{\hypertarget}[2]{#2}
+\providecommand{\hypersetup}[1]{}
+\providecommand{\texorpdfstring}[2]{#1}
+\providecommand{\phantomsection}{}
+"""
+
+# Commands whose printed text comes from hyperref itself (or loading it again) can't be
+# stubbed, so snippets using them get the full preamble even as previews
+HYPERREF_PATTERN = re.compile(
+    r"\\(?:autoref|Autoref|nameref|Nameref)(?![A-Za-z])|\\usepackage\s*(?:\[[^\]]*\])?\s*\{[^}]*hyperref"
+)
+
+def _cache_key(body, preamble_extra="", passes=1, bib_entries=None, use_biblatex=False,
+               dpi=DEFAULT_DPI, final=False):
+    """Content hash of everything that affects the rendered image"""
+    base_preamble = BASE_PREAMBLE_FULL if final else BASE_PREAMBLE_FAST
+    # JSON keeps field boundaries, so e.g. moving text from body to preamble_extra changes the key
+    canonical_bytes = json.dumps([base_preamble, preamble_extra, body, bib_entries,
+                                  passes, use_biblatex, dpi]).encode('utf-8')
+    return hashlib.sha256(canonical_bytes).hexdigest()
+
+_WORKDIR_LOCKS = {}
+_WORKDIR_LOCKS_GUARD = threading.Lock()
+
+@contextlib.contextmanager
+def _workdir_lock(temp_path):
+    """
+    Per-directory lock so concurrent workers don't build or link the same preamble format
+    at once. Pool workers are separate processes, so a thread lock is paired with a file
+    lock on .lock
+    """
+    with _WORKDIR_LOCKS_GUARD:
+        thread_lock = _WORKDIR_LOCKS.setdefault(temp_path, threading.Lock())
+
+    with thread_lock, open(temp_path / ".lock", "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            # msvcrt gives up after ~10s, so keep retrying
+            while True:
+                try:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+def build_format(temp_path, full_preamble):
+    """Precompile the preamble into preamble.fmt (mylatex-style) so compiles skip parsing it"""
+    fmt_file = temp_path / "preamble.fmt"
+    failed_marker = temp_path / "preamble.nofmt"
+    if fmt_file.exists():
+        return True
+    if failed_marker.exists():
+        return False
+
+    try:
+        with open(temp_path / "preamble.tex", 'w', encoding='utf-8') as f:
+            f.write(full_preamble + "\n\\dump\n")
+
+        # Load the stock pdflatex format in ini mode, read the preamble and dump it
+        pdflatex_cmd = find_command("pdflatex")
+        cmd = [pdflatex_cmd, "-ini", "-interaction=batchmode", "-jobname=preamble",
+               "&pdflatex", "preamble.tex"]
+        result = subprocess.run(cmd, cwd=temp_path, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=60)
+    except Exception:
+        # e.g. a timeout on a cold font cache; don't keep a partial dump, try again next time
+        fmt_file.unlink(missing_ok=True)
+        return False
+
+    if fmt_file.exists():
+        return True
+    if result.returncode > 0:
+        # Some packages refuse to be dumped; remember that and compile the full document instead
+        failed_marker.touch()
+    return False
+
+def _full_preamble(preamble_extra="", bib_entries=None, use_biblatex=False, final=False):
+    """Assemble the preamble for a snippet; returns (preamble, bibliography command)"""
+    base_preamble = BASE_PREAMBLE_FULL if final else BASE_PREAMBLE_FAST
+    full_preamble = base_preamble + "\n" + preamble_extra
+    
+    # Handle bibliography setup
+    if bib_entries:
+        if use_biblatex:
+            full_preamble += "\n\\usepackage[style=numeric]{biblatex}"
+            full_preamble += "\n\\addbibresource{references.bib}"
+            bib_command = "\\printbibliography"
+        else:
+            full_preamble += "\n\\usepackage{natbib}"
+            bib_command = "\\bibliography{references}"
+    else:
+        bib_command = ""
+    return full_preamble, bib_command
+
+def _workdir_for(full_preamble):
+    """
+    Working directory for a preamble, shared by all pool workers (see _workdir_lock) so
+    the precompiled preamble.fmt survives between compiles. Created on every call, in
+    case tmpfs cleanup removed it while the server was running.
+    """
+    preamble_hash = hashlib.sha1(full_preamble.encode('utf-8')).hexdigest()[:16]
+    temp_path = TEMP_DIR / preamble_hash
+    temp_path.mkdir(exist_ok=True)
+    return temp_path
+
+def _write_document(temp_path, full_preamble, document_body):
+    """
+    Write document.tex into a fresh job directory under the preamble's directory, against
+    the precompiled preamble when one is available. Only the format is shared, so the
+    directory lock is held just long enough to build it and link it into the job.
+    """
+    with _workdir_lock(temp_path):
+        has_fmt = build_format(temp_path, full_preamble)
+        job_path = temp_path / uuid.uuid4().hex
+        job_path.mkdir()
+        if has_fmt:
+            # pdflatex looks up -fmt in its working directory
+            try:
+                os.link(temp_path / "preamble.fmt", job_path / "preamble.fmt")
+            except OSError:  # filesystem without hard links
+                shutil.copy(temp_path / "preamble.fmt", job_path / "preamble.fmt")
+
+    # With a precompiled preamble the document only needs its body
+    fmt = "preamble" if has_fmt else None
+    latex_content = document_body if fmt else f"\n{full_preamble}\n{document_body}"
+
+    tex_file = job_path / "document.tex"
+    with open(tex_file, 'w', encoding='utf-8') as f:
+        f.write(latex_content)
+    return tex_file, fmt
+
+def _cached_png(key):
+    """Path of the cached PNG for key, or None; a hit is marked as recently used"""
+    png_file = CACHE_DIR / f"{key}.png"
+    try:
+        os.utime(png_file)  # mtime doubles as the LRU timestamp (atime is often not updated)
+    except FileNotFoundError:
+        return None
+    return png_file
+
+def _publish_png(png_file, key):
+    """Copy a rendered PNG into the cache under its content hash"""
+    cache_tmp = CACHE_DIR / f"{key}.{os.getpid()}.tmp"
+    shutil.copy(png_file, cache_tmp)
+    os.replace(cache_tmp, CACHE_DIR / f"{key}.png")  # atomic, so readers never see a partial file
+    _prune_cache()
+
+_LAST_PRUNE = 0.0
+
+def _prune_cache():
+    """Evict the least recently used PNGs once the cache grows past CACHE_MAX_MB"""
+    global _LAST_PRUNE
+    now = time.monotonic()
+    if now - _LAST_PRUNE < CACHE_PRUNE_INTERVAL:
+        return
+    _LAST_PRUNE = now
+
+    entries = []
+    for entry in os.scandir(CACHE_DIR):
+        if entry.name.endswith(".png"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:  # evicted by another process meanwhile
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    limit = CACHE_MAX_MB * 1024 * 1024
+    if total <= limit:
+        return
+    # Go a little below the limit so the next few publishes don't each trigger a sweep
+    for _, size, path in sorted(entries):
+        if total <= limit * 0.9:
+            break
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
+        total -= size
+
 def render_snippet(body, preamble_extra="", sanitize_graphics=True, 
                   passes=1, bib_entries=None, use_biblatex=False, 
-                  hide_warnings=False):
+                  hide_warnings=False, dpi=DEFAULT_DPI, final=False):
     """
-    Render LaTeX snippet and return PNG image data
+    Render LaTeX snippet and return the id of the PNG image
     Adapted from your notebook's render_snippet function
+    Uses the lighter interactive preamble unless final=True
     """
     try:
-        # Create unique temporary directory
-        temp_id = str(uuid.uuid4())
-        temp_path = TEMP_DIR / temp_id
-        temp_path.mkdir(exist_ok=True)
-        
+        # Short-circuit if this exact snippet was rendered before
+        key = _cache_key(body, preamble_extra, passes, bib_entries, use_biblatex, dpi, final)
+        if _cached_png(key):
+            return {
+                "success": True,
+                "id": key
+            }
+
         # Construct full LaTeX document
-        full_preamble = BASE_PREAMBLE + "\n" + preamble_extra
-        
-        # Handle bibliography setup
-        if bib_entries:
-            if use_biblatex:
-                full_preamble += "\n\\usepackage[style=numeric]{biblatex}"
-                full_preamble += "\n\\addbibresource{references.bib}"
-                bib_command = "\\printbibliography"
-            else:
-                full_preamble += "\n\\usepackage{natbib}"
-                bib_command = "\\bibliography{references}"
-        else:
-            bib_command = ""
-        
-        latex_content = f"""
-{full_preamble}
+        full_preamble, bib_command = _full_preamble(preamble_extra, bib_entries, use_biblatex, final)
+        temp_path = _workdir_for(full_preamble)
 
+        tex_file, fmt = _write_document(temp_path, full_preamble, f"""
 \\begin{{document}}
 {body}
 {bib_command}
 \\end{{document}}
-"""
-        
-        # Write LaTeX file
-        tex_file = temp_path / "document.tex"
-        with open(tex_file, 'w', encoding='utf-8') as f:
-            f.write(latex_content)
-        
-        # Write bibliography file if needed
-        if bib_entries:
-            bib_file = temp_path / "references.bib"
-            with open(bib_file, 'w', encoding='utf-8') as f:
-                f.write(bib_entries)
-        
-        # Compile LaTeX
-        compile_result = compile_latex(tex_file, passes, use_biblatex, hide_warnings)
-        
-        if not compile_result["success"]:
-            return {
-                "success": False,
-                "error": compile_result["error"],
-                "log": compile_result.get("log", "")
-            }
+""")
+        job_path = tex_file.parent
+        try:
+            # Write bibliography file if needed
+            if bib_entries:
+                bib_file = job_path / "references.bib"
+                with open(bib_file, 'w', encoding='utf-8') as f:
+                    f.write(bib_entries)
 
-        # Convert PDF to PNG (with cropping for better fit)
-        pdf_file = temp_path / "document.pdf"
-        png_file = temp_path / "document.png"
+            pdf_file = job_path / "document.pdf"
+            png_file = job_path / "document.png"
 
-        convert_result = pdf_to_png(pdf_file, png_file, dpi=300, crop=True)
+            # Compile LaTeX
+            compile_result = compile_latex(tex_file, passes, use_biblatex, hide_warnings, fmt=fmt,
+                                           full_preamble=full_preamble)
+            
+            if not compile_result["success"]:
+                return {
+                    "success": False,
+                    "error": compile_result["error"],
+                    "log": compile_result.get("log", "")
+                }
 
-        if not convert_result["success"]:
-            return {
-                "success": False,
-                "error": convert_result["error"]
-            }
+            # Convert PDF to PNG (with cropping for better fit)
+            convert_result = pdf_to_png(pdf_file, png_file, dpi=dpi, crop=True)
 
-        # Read PNG as base64
-        with open(png_file, 'rb') as f:
-            png_data = base64.b64encode(f.read()).decode('utf-8')
+            if not convert_result["success"]:
+                return {
+                    "success": False,
+                    "error": convert_result["error"]
+                }
 
-        # Cleanup
-        shutil.rmtree(temp_path)
+            # Publish the PNG under its content hash; the client fetches it from there
+            _publish_png(png_file, key)
+        finally:
+            shutil.rmtree(job_path, ignore_errors=True)
 
         return {
             "success": True,
-            "image_data": png_data,
-            "temp_id": temp_id
+            "id": key
         }
         
     except Exception as e:
@@ -127,28 +374,124 @@ def render_snippet(body, preamble_extra="", sanitize_graphics=True,
             "error": f"Unexpected error: {str(e)}"
         }
 
-def compile_latex(tex_file, passes=1, use_biblatex=False, hide_warnings=False):
-    """Compile LaTeX document"""
+# Batched snippets share one document, so each page is set in its own group and
+# \snippetreset undoes the global state one snippet could leak into the next: all
+# counters (including page) and the title macros that \maketitle globally disables
+BATCH_SETUP = r"""
+\makeatletter
+\def\snippet@globals{title,author,date,thanks,and,maketitle,@maketitle,@title,@author,@date,@thanks}
+\@for\snippet@name:=\snippet@globals\do{%
+  \expandafter\let\csname snippet@saved@\snippet@name\expandafter\endcsname
+    \csname\snippet@name\endcsname}
+\def\snippetreset{%
+  \begingroup\def\@elt##1{\global\csname c@##1\endcsname\z@}\cl@@ckpt\endgroup
+  \global\c@page\@ne
+  \@for\snippet@name:=\snippet@globals\do{%
+    \global\expandafter\let\csname\snippet@name\expandafter\endcsname
+      \csname snippet@saved@\snippet@name\endcsname}}
+\makeatother
+"""
+
+def render_batch(bodies, preamble_extra="", use_biblatex=False, dpi=DEFAULT_DPI, final=False):
+    """
+    Render several single-pass, bibliography-free snippets that share a preamble with
+    one pdflatex run, one page per snippet. Returns a render_snippet-style result for
+    each body, or None if the batch failed or did not split cleanly into one page per
+    snippet (the caller then renders them individually to get per-snippet errors).
+    """
+    try:
+        keys = [_cache_key(body, preamble_extra, use_biblatex=use_biblatex, dpi=dpi, final=final)
+                for body in bodies]
+
+        # Skip snippets that are already cached or repeated within the batch
+        pending = {}
+        for key, body in zip(keys, bodies):
+            if key not in pending and not _cached_png(key):
+                pending[key] = body
+
+        if pending:
+            full_preamble, _ = _full_preamble(preamble_extra, final=final)
+            temp_path = _workdir_for(full_preamble)
+            pages = "\n".join(f"\\snippetreset\\begingroup\n{body}\n\\clearpage\\endgroup"
+                              for body in pending.values())
+
+            tex_file, fmt = _write_document(temp_path, full_preamble, f"""{BATCH_SETUP}
+\\begin{{document}}
+{pages}
+\\end{{document}}
+""")
+            job_path = tex_file.parent
+            pdf_file = job_path / "document.pdf"
+            png_file = job_path / "document.png"
+            try:
+                compile_result = compile_latex(tex_file, fmt=fmt, full_preamble=full_preamble)
+                if not compile_result["success"]:
+                    return None
+
+                # pdfTeX reports the page count at the end of the log (wrapped at 79 columns)
+                log = tex_file.with_suffix(".log").read_text(encoding='utf-8', errors='replace')
+                match = re.search(r"Output written on .*?\((\d+) pages?,", log.replace("\n", ""))
+                if not match or int(match.group(1)) != len(pending):
+                    return None
+
+                for page, key in enumerate(pending, start=1):
+                    convert_result = pdf_to_png(pdf_file, png_file, dpi=dpi, crop=True, page=page)
+                    if not convert_result["success"]:
+                        return None
+                    _publish_png(png_file, key)
+            finally:
+                shutil.rmtree(job_path, ignore_errors=True)
+
+        return [{"success": True, "id": key} for key in keys]
+
+    except Exception:
+        return None
+
+def compile_latex(tex_file, passes=1, use_biblatex=False, hide_warnings=False, fmt=None,
+                  full_preamble=None):
+    """
+    Compile LaTeX document, optionally against a precompiled preamble format. If the
+    format can't be loaded, the document is recompiled once with full_preamble prepended
+    """
     try:
         temp_path = tex_file.parent
         
         for i in range(passes):
             # Run pdflatex
             pdflatex_cmd = find_command("pdflatex")
-            cmd = [pdflatex_cmd, "-interaction=nonstopmode", str(tex_file)]
+            cmd = [pdflatex_cmd, "-interaction=batchmode", "-halt-on-error"]
+            if fmt:
+                cmd.append(f"-fmt={fmt}")
+            # Intermediate passes only resolve refs/citations, so skip PDF output
+            if i < passes - 1:
+                cmd.append("-draftmode")
+            cmd.append(str(tex_file))
             result = subprocess.run(
                 cmd, 
                 cwd=temp_path, 
-                capture_output=True, 
+                stdout=subprocess.DEVNULL,  # the full log is in document.log if we need it
+                stderr=subprocess.PIPE,
                 text=True,
                 timeout=30
             )
             
             if result.returncode != 0:
+                # batchmode keeps the terminal quiet; the details are in the .log file
+                log_file = tex_file.with_suffix(".log")
+                if fmt and full_preamble is not None and not log_file.exists():
+                    # TeX only opens the log once the format has loaded, so the format itself is
+                    # unusable (e.g. dumped before a TeX Live update). Drop the job's link and the
+                    # shared copy in the preamble directory (see _write_document) so it is rebuilt
+                    (temp_path / f"{fmt}.fmt").unlink(missing_ok=True)
+                    (temp_path.parent / f"{fmt}.fmt").unlink(missing_ok=True)
+                    document = tex_file.read_text(encoding='utf-8')
+                    tex_file.write_text(f"\n{full_preamble}\n{document}", encoding='utf-8')
+                    return compile_latex(tex_file, passes, use_biblatex, hide_warnings)
+                log = log_file.read_text(encoding='utf-8', errors='replace') if log_file.exists() else ""
                 return {
                     "success": False,
                     "error": "LaTeX compilation failed",
-                    "log": result.stdout + "\n" + result.stderr
+                    "log": log + "\n" + result.stderr
                 }
             
             # Run bibliography if needed and on first pass
@@ -163,8 +506,8 @@ def compile_latex(tex_file, passes=1, use_biblatex=False, hide_warnings=False):
                 bib_result = subprocess.run(
                     bib_cmd,
                     cwd=temp_path,
-                    capture_output=True,
-                    text=True,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
                     timeout=30
                 )
                 # Note: bibtex/biber can fail on first run, that's normal
@@ -184,55 +527,55 @@ def compile_latex(tex_file, passes=1, use_biblatex=False, hide_warnings=False):
 
 def find_command(command):
     """Find the full path to a command"""
-    try:
-        result = subprocess.run(["which", command], 
-                              capture_output=True, 
-                              text=True, 
-                              timeout=5)
-        if result.returncode == 0:
-            return result.stdout.strip()
-    except:
-        pass
-    return command  # fallback to original command name
+    return TOOL_PATHS.get(command) or command  # fallback to original command name
+
+def pdf_to_png(pdf_file, png_file, dpi=DEFAULT_DPI, crop=True, page=1):
+    """Convert one (1-based) page of a PDF to PNG, optionally cropping margins for better preview fit"""
+    if pdfium is not None and Image is not None:
+        return _pdf_to_png_pdfium(pdf_file, png_file, dpi, crop, page)
 
-def pdf_to_png(pdf_file, png_file, dpi=150, crop=True):
-    """Convert PDF to PNG, optionally cropping margins for better preview fit"""
     try:
         source_pdf = pdf_file
 
         # Prefer cropping the PDF first using pdfcrop (TeX Live), keeps vector fidelity before rasterizing
         if crop and check_command("pdfcrop"):
             cropped_pdf = pdf_file.parent / "document-cropped.pdf"
-            pdfcrop_cmd = find_command("pdfcrop")
-            # keep a tiny margin (3bp) to avoid clipping
-            cmd = [pdfcrop_cmd, "--margins", "3", str(pdf_file), str(cropped_pdf)]
-            subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            # pdfcrop handles every page at once, so batches only need it once
+            if not cropped_pdf.exists():
+                pdfcrop_cmd = find_command("pdfcrop")
+                # keep a tiny margin (3bp) to avoid clipping
+                cmd = [pdfcrop_cmd, "--margins", "3", str(pdf_file), str(cropped_pdf)]
+                subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=30)
             if cropped_pdf.exists():
                 source_pdf = cropped_pdf
 
         # Try pdftoppm first (from poppler-utils)
         pdftoppm_cmd = find_command("pdftoppm")
-        cmd = [pdftoppm_cmd, "-png", "-singlefile", "-r", str(dpi), str(source_pdf), str(png_file.with_suffix(''))]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        cmd = [pdftoppm_cmd, "-png", "-singlefile", "-f", str(page), "-l", str(page), "-r", str(dpi),
+               str(source_pdf), str(png_file.with_suffix(''))]
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=30)
         
         if result.returncode == 0:
             # Optionally trim residual borders on the PNG if pdfcrop wasn't available
             if crop and not str(source_pdf).endswith("document-cropped.pdf"):
                 _trim_png_inplace(png_file)
+            _quantize_png_inplace(png_file)
             return {"success": True}
         
         # Fallback to ImageMagick convert
         convert_cmd = find_command("convert") if check_command("convert") else find_command("magick")
         # If magick is used, command is: magick -density <dpi> input.pdf output.png
+        source_page = f"{source_pdf}[{page - 1}]"
         if os.path.basename(convert_cmd) == "magick":
-            cmd = [convert_cmd, "-density", str(dpi), str(source_pdf), str(png_file)]
+            cmd = [convert_cmd, "-density", str(dpi), source_page, str(png_file)]
         else:
-            cmd = [convert_cmd, "-density", str(dpi), str(source_pdf), str(png_file)]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            cmd = [convert_cmd, "-density", str(dpi), source_page, str(png_file)]
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=30)
         
         if result.returncode == 0:
             if crop:
                 _trim_png_inplace(png_file)
+            _quantize_png_inplace(png_file)
             return {"success": True}
         
         return {
@@ -251,6 +594,56 @@ def pdf_to_png(pdf_file, png_file, dpi=150, crop=True):
             "error": f"Conversion error: {str(e)}"
         }
 
+def _pdf_to_png_pdfium(pdf_file, png_file, dpi=DEFAULT_DPI, crop=True, page=1):
+    """Rasterize and crop one page in-process with pdfium (no pdfcrop/pdftoppm forks)"""
+    try:
+        pdf = pdfium.PdfDocument(str(pdf_file))
+        try:
+            pdf_page = pdf[page - 1]
+            margins = (0, 0, 0, 0)
+
+            if crop:
+                # Find the ink at 72 DPI (one pixel per point), then only rasterize that
+                # region at full resolution
+                preview = pdf_page.render(scale=1).to_pil()
+                background = Image.new(preview.mode, preview.size, "white")
+                bbox = ImageChops.difference(preview, background).getbbox()
+                if bbox:
+                    # keep a tiny margin (3bp, as pdfcrop did) to avoid clipping
+                    left, top, right, bottom = bbox
+                    width, height = pdf_page.get_size()
+                    margins = (max(left - 3, 0), max(height - bottom - 3, 0),
+                               max(width - right - 3, 0), max(top - 3, 0))
+
+            image = pdf_page.render(scale=dpi / 72, crop=margins).to_pil()
+        finally:
+            pdf.close()
+
+        _quantize(image).save(png_file, "PNG", optimize=True)
+        return {"success": True}
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": f"Conversion error: {str(e)}"
+        }
+
+def _quantize(image):
+    """Reduce to a 64-colour palette; rendered text/math is near-monochrome, so this is lossless to the eye"""
+    return image.convert("RGB").quantize(colors=64, dither=Image.Dither.NONE)
+
+def _quantize_png_inplace(png_file):
+    """Palette-quantize a PNG written by pdftoppm/ImageMagick, if Pillow is available"""
+    if Image is None:
+        return False
+    try:
+        with Image.open(png_file) as image:
+            image = _quantize(image)
+        image.save(png_file, "PNG", optimize=True)
+        return True
+    except Exception:
+        return False
+
 def _trim_png_inplace(png_file):
     """Try to trim uniform borders from the PNG using ImageMagick if available"""
     try:
@@ -261,7 +654,7 @@ def _trim_png_inplace(png_file):
             cmd = [find_command("convert"), str(png_file), "-trim", "+repage", str(png_file)]
         else:
             return False
-        subprocess.run(cmd, capture_output=True, text=True, timeout=20)
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=20)
         return True
     except Exception:
         return False
@@ -273,34 +666,204 @@ def readiness_report():
         "biber": check_command("biber"),
         "bibtex": check_command("bibtex"),
         "pdftoppm": check_command("pdftoppm"),
+        "pypdfium2": pdfium is not None,
     "convert": check_command("convert") or check_command("magick"),
     "pdfcrop": check_command("pdfcrop")
     }
     
     return {
-    "ready": tools["pdflatex"] and (tools["pdftoppm"] or tools["convert"]),
+    "ready": tools["pdflatex"] and (tools["pypdfium2"] or tools["pdftoppm"] or tools["convert"]),
         "tools": tools
     }
 
 def check_command(command):
     """Check if a command is available"""
+    return TOOL_PATHS.get(command) is not None
+
+# Request options that don't change the preamble, so snippets can differ in them and still be batched
+_PER_SNIPPET_OPTIONS = ("body", "sanitize_graphics", "hide_warnings")
+
+def _forward_result(source, target):
+    """Resolve target with source's outcome, unless target was already cancelled"""
     try:
-        # First try using 'which' to find the command
-        result = subprocess.run(["which", command], 
-                              capture_output=True, 
-                              text=True, 
-                              timeout=5)
-        if result.returncode == 0:
-            return True
-            
-        # Fallback: try running the command with --version
-        result = subprocess.run([command, "--version"], 
-                              capture_output=True, 
-                              text=True, 
-                              timeout=5)
-        return result.returncode == 0
-    except:
-        return False
+        if source.cancelled():  # dropped by _rebuild_pool shutting down a broken pool
+            target.cancel()
+        elif source.exception() is not None:
+            target.set_exception(source.exception())
+        else:
+            target.set_result(source.result())
+    except concurrent.futures.InvalidStateError:
+        pass  # the request timed out and cancelled its future
+
+def _fail(future, error):
+    """Resolve future with error, unless it was already cancelled"""
+    try:
+        future.set_exception(error)
+    except concurrent.futures.InvalidStateError:
+        pass
+
+# Snippets that change global state can't be isolated from each other within a batch
+GLOBAL_STATE_PATTERN = re.compile(
+    r"\\(?:global|gdef|xdef|newcounter|newlength|newtheorem|twocolumn|onecolumn|makeatletter"
+    r"|pagenumbering|AtBeginDocument|AtEndDocument|AtBeginShipout|AddToHook)(?![A-Za-z])"
+)
+
+class BatchCollector:
+    """
+    Coalesces compile requests that arrive within a short window and share a preamble
+    into a single render_batch call, so pdflatex's fixed startup cost is paid once.
+    """
+
+    def __init__(self, executor, window=0.05, max_batch=16):
+        self.executor = executor
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def submit(self, **kwargs):
+        """Queue a render_snippet call and return a Future for its result"""
+        # Multi-pass, bibliography and state-changing compiles can't share a document
+        if (kwargs.get("passes", 1) != 1 or kwargs.get("bib_entries")
+                or GLOBAL_STATE_PATTERN.search(kwargs["body"])):
+            return self.executor.submit(render_snippet, **kwargs)
+
+        self._ensure_started()
+        future = concurrent.futures.Future()
+        self._queue.put((kwargs, future))
+        return future
+
+    def _ensure_started(self):
+        # Started lazily so importing the module (e.g. in pool workers) spawns no thread
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="latex-batcher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            pending = [first]
+            closing = False
+            deadline = time.monotonic() + self.window
+            while len(pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                pending.append(item)
+
+            # Everything except the body must match for snippets to share a document
+            groups = {}
+            for kwargs, future in pending:
+                options = repr(sorted((name, value) for name, value in kwargs.items()
+                                      if name not in _PER_SNIPPET_OPTIONS))
+                groups.setdefault(options, []).append((kwargs, future))
+
+            for group in groups.values():
+                try:
+                    self._dispatch(group)
+                except Exception as e:  # e.g. a broken pool; keep the collector thread alive
+                    for _, future in group:
+                        _fail(future, e)
+
+            if closing:
+                return
+
+    def close(self):
+        """Stop the collector thread once the requests already queued are dispatched"""
+        self._queue.put(None)
+
+    def _submit_single(self, kwargs, future):
+        """
+        Render one snippet on its own. Also runs from done-callbacks, where a raised
+        exception would be swallowed, so submit errors are forwarded to the future instead
+        """
+        try:
+            inner = self.executor.submit(render_snippet, **kwargs)
+        except Exception as e:  # e.g. BrokenProcessPool, so api_compile rebuilds the pool
+            _fail(future, e)
+            return
+        inner.add_done_callback(lambda done: _forward_result(done, future))
+
+    def _dispatch(self, group):
+        if len(group) == 1:
+            self._submit_single(*group[0])
+            return
+
+        # submit() only queues single-pass, bibliography-free requests
+        options = {name: value for name, value in group[0][0].items()
+                   if name not in _PER_SNIPPET_OPTIONS + ("passes", "bib_entries")}
+        inner = self.executor.submit(render_batch, [kwargs["body"] for kwargs, _ in group], **options)
+        inner.add_done_callback(lambda done: self._resolve_batch(done, group))
+
+    def _resolve_batch(self, done, group):
+        if done.cancelled() or isinstance(done.exception(), BrokenProcessPool):
+            # Retrying on a dead pool would fail the same way; let api_compile rebuild it
+            for _, future in group:
+                _forward_result(done, future)
+            return
+
+        results = done.result() if done.exception() is None else None
+        if results is None:
+            # Fall back to compiling each snippet on its own
+            for kwargs, future in group:
+                self._submit_single(kwargs, future)
+            return
+
+        for (_, future), result in zip(group, results):
+            try:
+                future.set_result(result)
+            except concurrent.futures.InvalidStateError:
+                pass
+
+def _warm_worker():
+    """
+    Pool initializer: precompile the interactive base preamble into this worker's
+    preamble.fmt, so the first default compile doesn't pay for it.
+    """
+    try:
+        if not check_command("pdflatex"):
+            return
+        full_preamble, _ = _full_preamble()
+        temp_path = _workdir_for(full_preamble)
+        with _workdir_lock(temp_path):
+            build_format(temp_path, full_preamble)
+    except Exception:
+        pass  # an initializer error would break the whole pool
+
+def warm_up():
+    """Start the pool's workers now (running _warm_worker) rather than on the first request"""
+    for _ in range(COMPILE_WORKERS):
+        EXECUTOR.submit(os.getpid)
+
+def _new_pool():
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=COMPILE_WORKERS, initializer=_warm_worker)
+    return executor, BatchCollector(executor)
+
+def _rebuild_pool(broken_batcher):
+    """Replace a pool that broke because a worker died (e.g. was OOM-killed)"""
+    global EXECUTOR, BATCHER
+    with _POOL_LOCK:
+        if BATCHER is not broken_batcher:
+            return  # another request already replaced it
+        EXECUTOR, BATCHER = _new_pool()
+    broken_batcher.close()
+    broken_batcher.executor.shutdown(wait=False, cancel_futures=True)
+
+# Compiles run in worker processes so concurrent requests don't contend on the GIL
+COMPILE_WORKERS = os.cpu_count() or 1
+_POOL_LOCK = threading.Lock()
+EXECUTOR, BATCHER = _new_pool()
 
 # API Routes
 @app.route('/')
@@ -315,7 +878,7 @@ def static_files(filename):
 
 @app.route('/api/compile', methods=['POST'])
 def api_compile():
-    """Compile LaTeX snippet and return PNG"""
+    """Compile LaTeX snippet and return the id of the rendered PNG"""
     data = request.get_json()
     
     if not data or 'body' not in data:
@@ -324,22 +887,87 @@ def api_compile():
             "error": "Missing 'body' parameter"
         }), 400
     
-    result = render_snippet(
-        body=data['body'],
-        preamble_extra=data.get('preamble_extra', ''),
-        sanitize_graphics=data.get('sanitize_graphics', True),
-        passes=data.get('passes', 1),
-        bib_entries=data.get('bib_entries'),
-        use_biblatex=data.get('use_biblatex', False),
-        hide_warnings=data.get('hide_warnings', False)
-    )
+    try:
+        dpi = int(data.get('dpi', DEFAULT_DPI))
+    except (TypeError, ValueError):
+        return jsonify({
+            "success": False,
+            "error": "Invalid 'dpi' parameter"
+        }), 400
+    dpi = max(MIN_DPI, min(dpi, MAX_DPI))
+    
+    options = {
+        "body": data['body'],
+        "preamble_extra": data.get('preamble_extra', ''),
+        "passes": data.get('passes', 1),
+        "bib_entries": data.get('bib_entries'),
+        "use_biblatex": data.get('use_biblatex', False),
+        "dpi": dpi,
+        "final": data.get('final', False) or bool(HYPERREF_PATTERN.search(
+            data['body'] + "\n" + data.get('preamble_extra', '')))
+    }
+    
+    # Answer cache hits directly instead of waiting out the batch window
+    key = _cache_key(**options)
+    if _cached_png(key):
+        return jsonify({
+            "success": True,
+            "id": key,
+            "dpi": dpi
+        })
+    
+    batcher = BATCHER
+    future = None
+    try:
+        future = batcher.submit(
+            sanitize_graphics=data.get('sanitize_graphics', True),
+            hide_warnings=data.get('hide_warnings', False),
+            **options
+        )
+        result = future.result(timeout=60)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        result = {
+            "success": False,
+            "error": "LaTeX compilation timed out"
+        }
+    except (BrokenProcessPool, concurrent.futures.CancelledError):
+        _rebuild_pool(batcher)
+        result = {
+            "success": False,
+            "error": "LaTeX compiler process crashed, please try again"
+        }
+    except Exception as e:
+        result = {
+            "success": False,
+            "error": f"Compilation error: {str(e)}"
+        }
     
+    if result.get("success"):
+        result["dpi"] = dpi  # lets the frontend size the image independently of resolution
     return jsonify(result)
 
+@app.route('/api/compile/<image_id>.png', methods=['GET'])
+def api_compile_image(image_id):
+    """Serve a compiled PNG by the id returned from POST /api/compile"""
+    if not re.fullmatch(r"[0-9a-f]{64}", image_id):
+        return jsonify({"success": False, "error": "Invalid image id"}), 404
+    png_file = CACHE_DIR / f"{image_id}.png"
+    if not png_file.exists():
+        return jsonify({"success": False, "error": "Image not found"}), 404
+    # Serving the path lets the WSGI server use its file wrapper (sendfile) instead of
+    # copying the image through Python
+    return send_file(png_file, mimetype="image/png")
+
+# TOOL_PATHS is resolved once at import, so the report can't change while the server runs
+@functools.lru_cache(maxsize=1)
+def _readiness_json():
+    return json.dumps(readiness_report()).encode('utf-8')
+
 @app.route('/api/readiness', methods=['GET'])
 def api_readiness():
     """Check if LaTeX tools are available"""
-    return jsonify(readiness_report())
+    return Response(_readiness_json(), mimetype="application/json")
 
 @app.route('/api/health', methods=['GET'])
 def api_health():
@@ -356,5 +984,7 @@ if __name__ == '__main__':
     # Check readiness
     readiness = readiness_report()
     print(f"System readiness: {readiness}")
+    warm_up()
     
-    app.run(debug=True, host='127.0.0.1', port=5000)
+    # Development server only; ./start_backend.sh runs the app under gunicorn (see gunicorn.conf.py)
+    app.run(debug=False, host='127.0.0.1', port=5000)
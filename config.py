@@ -13,7 +13,10 @@ CLEANUP_TEMP_FILES = True
 
 # PDF to PNG Conversion
 DEFAULT_DPI = 150
+MIN_DPI = 72
+MAX_DPI = 300  # requests outside this range are clamped
 PREFER_PDFTOPPM = True  # Use pdftoppm over ImageMagick if available
+CACHE_MAX_MB = 64  # rendered previews kept for reuse; oldest evicted first
 
 # Workshop Settings
 AUTO_SAVE_ENABLED = True
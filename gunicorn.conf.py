@@ -0,0 +1,18 @@
+# Gunicorn settings for the LaTeX backend, picked up by `gunicorn backend.app:app`
+# when run from the project root.
+
+bind = "127.0.0.1:5000"
+
+# Compiles already run in each worker's process pool, so a couple of threaded workers
+# are enough to keep requests overlapping (and let the batch collector see them together)
+workers = 2
+worker_class = "gthread"
+threads = 8
+
+timeout = 60
+
+
+def post_worker_init(worker):
+    # Start the compile pool and precompile the base preamble before taking requests
+    from backend.app import warm_up
+    warm_up()
@@ -25,10 +25,8 @@ trap cleanup SIGINT SIGTERM
 source venv/bin/activate
 
 echo "📡 Starting backend server on port 5000..."
-cd backend
-python app.py &
+gunicorn backend.app:app &
 BACKEND_PID=$!
-cd ..
 
 # Wait a moment for backend to start
 sleep 3
@@ -12,6 +12,5 @@ else
     exit 1
 fi
 
-# Start the backend
-cd backend
-python app.py
+# Start the backend (settings in gunicorn.conf.py)
+gunicorn backend.app:app
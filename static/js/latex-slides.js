@@ -179,10 +179,12 @@ async function compileLatex(editorId, outputId) {
                 const result = await response.json();
 
                 if (result.success) {
-                        // Display the rendered image
+                        // Display the rendered image at the size a 300 DPI render would have
+                        const scale = 300 / result.dpi;
                         output.innerHTML = `
-                <img src="data:image/png;base64,${result.image_data}" 
+                <img src="${API_BASE}/compile/${result.id}.png" 
                      alt="Rendered LaTeX" 
+                     onload="this.style.width = (this.naturalWidth * ${scale}) + 'px'"
                      style="max-width: 100%; height: auto;" />
             `;
                 } else {